@@ -1,293 +1,140 @@
 from __future__ import annotations
 
-import datetime as _dt
 import json
 import os
-import re
+import queue
 import sqlite3
-import urllib.parse
+import stat
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from http import HTTPStatus
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Any
-
-ALLOWED_TYPES = {"http", "tcp", "dns", "icmp"}
+from typing import Any, Iterator
+from urllib.parse import parse_qs
+
+from validators import (
+    ALLOWED_SCRAPE_PROFILES,
+    DEFAULT_SCRAPE_PROFILE,
+    ICMP_DEFAULT_COUNT,
+    ICMP_DEFAULT_DF,
+    ICMP_DEFAULT_INTERVAL_MS,
+    ICMP_DEFAULT_PACKET_SIZE,
+    ICMP_DEFAULT_TIMEOUT_MS,
+    ICMP_FIELDS,
+    HttpError,
+    bool_from_any,
+    normalize_name,
+    normalize_scrape_profile,
+    normalize_target,
+    normalize_type,
+    resolve_icmp_fields,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
 DB_PATH = Path(os.environ.get("DB_PATH", "/data/targets.db"))
 STATIC_DIR = Path(os.environ.get("STATIC_DIR", "/app/static"))
 SEED_FILE = Path(os.environ.get("SEED_FILE", "/app/seed.json"))
+DB_POOL_SIZE = max(1, int(os.environ.get("DB_POOL_SIZE", "4")))
+WORKERS = max(1, int(os.environ.get("WORKERS", str(max(8, (os.cpu_count() or 1) * 2)))))
 
-_PORT_SUFFIX_RE = re.compile(r"^[^:]+:\d+$")
-_BRACKET_PORT_RE = re.compile(r"^\[.+\]:\d+$")
-
-ICMP_DEFAULT_COUNT = 4
-ICMP_DEFAULT_INTERVAL_MS = 1000
-ICMP_DEFAULT_TIMEOUT_MS = 1000
-ICMP_DEFAULT_PACKET_SIZE = 56
-ICMP_DEFAULT_DF = False
-
-ICMP_COUNT_MIN = 1
-ICMP_COUNT_MAX = 500
-ICMP_INTERVAL_MS_MIN = 10
-ICMP_INTERVAL_MS_MAX = 1000
-ICMP_TIMEOUT_MS_MIN = 200
-ICMP_TIMEOUT_MS_MAX = 5000
-ICMP_PACKET_SIZE_MIN = 0
-ICMP_PACKET_SIZE_MAX = 1472
-
-ALLOWED_SCRAPE_PROFILES = {"1s", "5s", "15s", "60s"}
-DEFAULT_SCRAPE_PROFILE = "15s"
-
-ICMP_PROFILE_ESTIMATED_MS_MAX_BY_SCRAPE_PROFILE = {
-    "1s": 900,
-    "5s": 4500,
-    "15s": 9000,
-    "60s": 9000,
-}
-
-
-class HttpError(Exception):
-    def __init__(self, status: int, message: str):
-        self.status = status
-        self.message = message
-        super().__init__(message)
-
-
-def _now_iso() -> str:
-    return _dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
-
-
-def _bool_from_any(value: Any, *, field: str) -> bool:
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, int) and value in (0, 1):
-        return bool(value)
-    if isinstance(value, str):
-        lowered = value.strip().lower()
-        if lowered in ("true", "1", "yes", "y", "on"):
-            return True
-        if lowered in ("false", "0", "no", "n", "off"):
-            return False
-    raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be a boolean")
-
-
-def _int_from_any(value: Any, *, field: str) -> int:
-    if isinstance(value, bool):
-        raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be an integer")
-    if isinstance(value, int):
-        return value
-    if isinstance(value, str):
-        raw = value.strip()
-        if raw.isdigit():
-            return int(raw)
-    raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be an integer")
+_REQUEST_SLOTS = threading.BoundedSemaphore(WORKERS)
 
+_STATIC_ROOT = STATIC_DIR.resolve()
+_STATIC_CACHE: dict[str, tuple[int, bytes, str]] = {}
 
-def _optional_int_from_any(value: Any, *, field: str) -> int | None:
-    if value is None:
-        return None
-    if isinstance(value, str) and value.strip() == "":
-        return None
-    return _int_from_any(value, field=field)
-
-
-def _validate_int_range(value: int, *, field: str, min_value: int, max_value: int) -> int:
-    if not (min_value <= value <= max_value):
-        raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be in range {min_value}..{max_value}")
-    return value
-
-
-def _normalize_scrape_profile(raw_profile: Any) -> str | None:
-    if raw_profile is None:
-        return None
-    if not isinstance(raw_profile, str):
-        raise HttpError(HTTPStatus.BAD_REQUEST, "scrape_profile must be a string")
-    profile = raw_profile.strip()
-    if profile == "":
-        return None
-    if profile not in ALLOWED_SCRAPE_PROFILES:
-        raise HttpError(HTTPStatus.BAD_REQUEST, "scrape_profile must be one of: 1s, 5s, 15s, 60s")
-    return profile
-
+_DB_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+PRAGMA cache_size=-20000;
+"""
 
-def _effective_scrape_profile(profile: Any) -> str:
-    if isinstance(profile, str) and profile in ALLOWED_SCRAPE_PROFILES:
-        return profile
-    return DEFAULT_SCRAPE_PROFILE
 
+def _json_dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
 
-def _icmp_effective_profile(
-    *,
-    icmp_count: int | None,
-    icmp_interval_ms: int | None,
-    icmp_timeout_ms: int | None,
-    icmp_packet_size: int | None,
-    icmp_df: bool | None,
-) -> dict[str, Any]:
-    return {
-        "icmp_count": ICMP_DEFAULT_COUNT if icmp_count is None else icmp_count,
-        "icmp_interval_ms": ICMP_DEFAULT_INTERVAL_MS if icmp_interval_ms is None else icmp_interval_ms,
-        "icmp_timeout_ms": ICMP_DEFAULT_TIMEOUT_MS if icmp_timeout_ms is None else icmp_timeout_ms,
-        "icmp_packet_size": ICMP_DEFAULT_PACKET_SIZE if icmp_packet_size is None else icmp_packet_size,
-        "icmp_df": ICMP_DEFAULT_DF if icmp_df is None else icmp_df,
-    }
 
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
 
-def _validate_icmp_profile_duration(
-    *,
-    icmp_count: int,
-    icmp_interval_ms: int,
-    icmp_timeout_ms: int,
-    scrape_profile: str,
-) -> None:
-    estimated_ms = max(0, icmp_count - 1) * icmp_interval_ms + icmp_timeout_ms
-    max_ms = ICMP_PROFILE_ESTIMATED_MS_MAX_BY_SCRAPE_PROFILE.get(
-        scrape_profile, ICMP_PROFILE_ESTIMATED_MS_MAX_BY_SCRAPE_PROFILE[DEFAULT_SCRAPE_PROFILE]
-    )
-    if estimated_ms > max_ms:
-        raise HttpError(
-            HTTPStatus.BAD_REQUEST,
-            f"icmp profile too long for scrape_profile={scrape_profile} (estimated {estimated_ms}ms > {max_ms}ms)",
-        )
 
+def _now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
-def _normalize_type(raw_type: Any) -> str:
-    if not isinstance(raw_type, str):
-        raise HttpError(HTTPStatus.BAD_REQUEST, "type must be a string")
-    target_type = raw_type.strip().lower()
-    if target_type not in ALLOWED_TYPES:
-        raise HttpError(HTTPStatus.BAD_REQUEST, "type must be one of: http, tcp, dns, icmp")
-    return target_type
 
+_SD_CACHE: dict[str, tuple[bytes, str]] = {}
+_TARGETS_VERSION = 0
+_TARGETS_VERSION_LOCK = threading.Lock()
 
-def _normalize_name(raw_name: Any) -> str | None:
-    if raw_name is None:
-        return None
-    if not isinstance(raw_name, str):
-        raise HttpError(HTTPStatus.BAD_REQUEST, "name must be a string")
-    name = raw_name.strip()
-    return name or None
-
-
-def _validate_port(port: int) -> None:
-    if not (1 <= port <= 65535):
-        raise HttpError(HTTPStatus.BAD_REQUEST, "port must be in range 1..65535")
-
-
-def _normalize_host_port(raw: str, *, default_port: int) -> str:
-    if "://" in raw:
-        raise HttpError(HTTPStatus.BAD_REQUEST, "target must not include a URL scheme")
-    if any(ch.isspace() for ch in raw):
-        raise HttpError(HTTPStatus.BAD_REQUEST, "target must not contain whitespace")
-    if any(sep in raw for sep in ("/", "?", "#")):
-        raise HttpError(HTTPStatus.BAD_REQUEST, "target must be in host:port format")
-
-    if raw.startswith("["):
-        end = raw.find("]")
-        if end == -1:
-            raise HttpError(HTTPStatus.BAD_REQUEST, "invalid IPv6 target: missing closing ']'")
-        host = raw[1:end].strip()
-        rest = raw[end + 1 :]
-        if not host:
-            raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: empty host")
-
-        if rest == "":
-            port = default_port
-        elif rest.startswith(":"):
-            port_str = rest[1:].strip()
-            if not port_str.isdigit():
-                raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: port must be numeric")
-            port = int(port_str)
-        else:
-            raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: unexpected characters after ']'")
-
-        _validate_port(port)
-        return f"[{host.lower()}]:{port}"
-
-    colon_count = raw.count(":")
-    if colon_count == 0:
-        host = raw.strip()
-        port = default_port
-    elif colon_count == 1:
-        host, port_str = raw.rsplit(":", 1)
-        host = host.strip()
-        port_str = port_str.strip()
-        if not port_str.isdigit():
-            raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: port must be numeric")
-        port = int(port_str)
-    else:
-        raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: IPv6 must be in [addr]:port format")
-
-    if not host:
-        raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: empty host")
-    _validate_port(port)
-    return f"{host.lower()}:{port}"
-
-
-def _normalize_target(target_type: str, raw_target: Any) -> str:
-    if not isinstance(raw_target, str):
-        raise HttpError(HTTPStatus.BAD_REQUEST, "target must be a string")
-
-    target = raw_target.strip()
-    if not target:
-        raise HttpError(HTTPStatus.BAD_REQUEST, "target must not be empty")
-
-    if target_type == "http":
-        if "://" not in target:
-            target = "https://" + target
-        parsed = urllib.parse.urlparse(target)
-        scheme = parsed.scheme.lower()
-        if scheme not in ("http", "https"):
-            raise HttpError(HTTPStatus.BAD_REQUEST, "http target scheme must be http or https")
-        if not parsed.netloc:
-            raise HttpError(HTTPStatus.BAD_REQUEST, "http target must include a hostname")
-
-        normalized = urllib.parse.urlunparse(
-            (
-                scheme,
-                parsed.netloc.lower(),
-                parsed.path,
-                parsed.params,
-                parsed.query,
-                parsed.fragment,
-            )
-        )
-        return normalized
+_TARGET_CACHE: OrderedDict[int, tuple[int, dict[str, Any]]] = OrderedDict()
+_TARGET_CACHE_LOCK = threading.Lock()
+_TARGET_CACHE_SIZE = 512
+_SD_ETAG_PREFIX = f'W/"{int(time.time())}-'
 
-    if target_type == "tcp":
-        return _normalize_host_port(target, default_port=443)
+_POOL: queue.Queue[sqlite3.Connection] = queue.Queue()
+_WRITER: sqlite3.Connection | None = None
+_WRITER_LOCK = threading.Lock()
 
-    if target_type == "dns":
-        return _normalize_host_port(target, default_port=53)
 
-    if target_type == "icmp":
-        if "://" in target:
-            raise HttpError(HTTPStatus.BAD_REQUEST, "icmp target must not include a URL scheme")
-        if any(ch.isspace() for ch in target):
-            raise HttpError(HTTPStatus.BAD_REQUEST, "target must not contain whitespace")
-        if any(sep in target for sep in ("/", "?", "#")):
-            raise HttpError(HTTPStatus.BAD_REQUEST, "icmp target must be a hostname or IP address")
+def _db_open() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_DB_PRAGMAS)
+    return conn
 
-        if _BRACKET_PORT_RE.match(target) or _PORT_SUFFIX_RE.match(target):
-            raise HttpError(HTTPStatus.BAD_REQUEST, "icmp target must not include a port")
 
-        if target.startswith("[") and target.endswith("]"):
-            target = target[1:-1]
+def _db_pool_init() -> None:
+    global _WRITER
+    if _WRITER is not None:
+        return
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    _WRITER = _db_open()
+    for _ in range(DB_POOL_SIZE):
+        _POOL.put(_db_open())
 
-        return target.lower()
 
-    raise HttpError(HTTPStatus.BAD_REQUEST, "unsupported type")
+@contextmanager
+def _db_connect(*, write: bool = False) -> Iterator[sqlite3.Connection]:
+    if _WRITER is None:
+        raise RuntimeError("database is not initialized")
 
+    if not write:
+        conn = _POOL.get()
+        try:
+            yield conn
+        finally:
+            _POOL.put(conn)
+        return
 
-def _db_connect() -> sqlite3.Connection:
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH, timeout=30)
-    conn.row_factory = sqlite3.Row
-    return conn
+    with _WRITER_LOCK:
+        conn = _WRITER
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.OperationalError:
+                pass
+            raise
 
 
 def _db_init() -> None:
-    with _db_connect() as conn:
+    _db_pool_init()
+    with _db_connect(write=True) as conn:
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS targets (
@@ -309,6 +156,14 @@ def _db_init() -> None:
             """
         )
         _db_ensure_columns(conn)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_targets_type_enabled_target ON targets(type, enabled, target)"
+        )
+
+
+def _db_analyze() -> None:
+    with _db_connect(write=True) as conn:
+        conn.execute("ANALYZE")
 
 
 def _db_ensure_columns(conn: sqlite3.Connection) -> None:
@@ -333,6 +188,57 @@ def _db_is_empty() -> bool:
         return int(row["cnt"]) == 0
 
 
+_TRIBOOL: dict[bool | None, int | None] = {True: 1, False: 0, None: None}
+
+_SQL_INSERT_TARGET = """
+    INSERT INTO targets(
+        type,
+        target,
+        name,
+        enabled,
+        created_at,
+        updated_at,
+        scrape_profile,
+        icmp_count,
+        icmp_interval_ms,
+        icmp_timeout_ms,
+        icmp_packet_size,
+        icmp_df
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _insert_params(
+    *,
+    now: str,
+    target_type: str,
+    target: str,
+    name: str | None,
+    enabled: bool,
+    scrape_profile: str | None,
+    icmp_count: int | None,
+    icmp_interval_ms: int | None,
+    icmp_timeout_ms: int | None,
+    icmp_packet_size: int | None,
+    icmp_df: bool | None,
+) -> tuple[Any, ...]:
+    return (
+        target_type,
+        target,
+        name,
+        int(enabled),
+        now,
+        now,
+        scrape_profile,
+        icmp_count,
+        icmp_interval_ms,
+        icmp_timeout_ms,
+        icmp_packet_size,
+        _TRIBOOL[icmp_df],
+    )
+
+
 def _db_insert_target(
     *,
     target_type: str,
@@ -346,73 +252,215 @@ def _db_insert_target(
     icmp_packet_size: int | None,
     icmp_df: bool | None,
 ) -> int:
-    now = _now_iso()
-    with _db_connect() as conn:
+    params = _insert_params(
+        now=_now_iso(),
+        target_type=target_type,
+        target=target,
+        name=name,
+        enabled=enabled,
+        scrape_profile=scrape_profile,
+        icmp_count=icmp_count,
+        icmp_interval_ms=icmp_interval_ms,
+        icmp_timeout_ms=icmp_timeout_ms,
+        icmp_packet_size=icmp_packet_size,
+        icmp_df=icmp_df,
+    )
+    with _db_connect(write=True) as conn:
         try:
-            cursor = conn.execute(
-                """
-                INSERT INTO targets(
-                    type,
-                    target,
-                    name,
-                    enabled,
-                    created_at,
-                    updated_at,
-                    scrape_profile,
-                    icmp_count,
-                    icmp_interval_ms,
-                    icmp_timeout_ms,
-                    icmp_packet_size,
-                    icmp_df
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    target_type,
-                    target,
-                    name,
-                    1 if enabled else 0,
-                    now,
-                    now,
-                    scrape_profile,
-                    icmp_count,
-                    icmp_interval_ms,
-                    icmp_timeout_ms,
-                    icmp_packet_size,
-                    (1 if icmp_df else 0) if icmp_df is not None else None,
-                ),
-            )
+            cursor = conn.execute(_SQL_INSERT_TARGET, params)
         except sqlite3.IntegrityError as exc:
             raise HttpError(HTTPStatus.CONFLICT, "target already exists") from exc
-        return int(cursor.lastrowid)
+    _targets_changed()
+    return int(cursor.lastrowid)
+
+
+def _db_insert_targets(rows: list[tuple[Any, ...]]) -> list[int]:
+    conflicts: list[int] = []
+    with _db_connect(write=True) as conn:
+        conn.execute("SAVEPOINT batch")
+        try:
+            conn.executemany(_SQL_INSERT_TARGET, rows)
+        except sqlite3.IntegrityError:
+            conn.execute("ROLLBACK TO batch")
+            for pos, params in enumerate(rows):
+                try:
+                    conn.execute(_SQL_INSERT_TARGET, params)
+                except sqlite3.IntegrityError:
+                    conflicts.append(pos)
+        conn.execute("RELEASE batch")
+    _targets_changed()
+    return conflicts
+
+
+_SQL_GET_TARGET = "SELECT * FROM targets WHERE id = ?"
 
 
 def _db_get_target(target_id: int) -> dict[str, Any] | None:
+    version = _TARGETS_VERSION
+    with _TARGET_CACHE_LOCK:
+        cached = _TARGET_CACHE.get(target_id)
+        if cached is not None and cached[0] == version:
+            _TARGET_CACHE.move_to_end(target_id)
+            return dict(cached[1])
+
     with _db_connect() as conn:
-        row = conn.execute("SELECT * FROM targets WHERE id = ?", (target_id,)).fetchone()
-        if row is None:
-            return None
-        return dict(row)
+        row = conn.execute(_SQL_GET_TARGET, (target_id,)).fetchone()
+    if row is None:
+        return None
+
+    item = dict(row)
+    with _TARGET_CACHE_LOCK:
+        _TARGET_CACHE[target_id] = (version, item)
+        _TARGET_CACHE.move_to_end(target_id)
+        if len(_TARGET_CACHE) > _TARGET_CACHE_SIZE:
+            _TARGET_CACHE.popitem(last=False)
+    return dict(item)
+
+
+_SQL_TARGET_JSON = """
+    json_object(
+        'id', id,
+        'type', type,
+        'target', target,
+        'name', name,
+        'enabled', enabled,
+        'created_at', created_at,
+        'updated_at', updated_at,
+        'scrape_profile', scrape_profile,
+        'icmp_count', icmp_count,
+        'icmp_interval_ms', icmp_interval_ms,
+        'icmp_timeout_ms', icmp_timeout_ms,
+        'icmp_packet_size', icmp_packet_size,
+        'icmp_df', icmp_df
+    )
+"""
 
 
-def _db_list_targets(*, target_type: str | None, enabled: bool | None) -> list[dict[str, Any]]:
-    where = []
+_SQL_LIST_TARGETS = {
+    (False, False): f"SELECT {_SQL_TARGET_JSON} FROM targets ORDER BY type, target",
+    (True, False): f"SELECT {_SQL_TARGET_JSON} FROM targets WHERE type = ? ORDER BY type, target",
+    (False, True): f"SELECT {_SQL_TARGET_JSON} FROM targets WHERE enabled = ? ORDER BY type, target",
+    (True, True): f"SELECT {_SQL_TARGET_JSON} FROM targets WHERE type = ? AND enabled = ? ORDER BY type, target",
+}
+
+
+def _db_list_targets_json(*, target_type: str | None, enabled: bool | None) -> bytes:
     params: list[Any] = []
     if target_type is not None:
-        where.append("type = ?")
         params.append(target_type)
     if enabled is not None:
-        where.append("enabled = ?")
-        params.append(1 if enabled else 0)
-
-    sql = "SELECT * FROM targets"
-    if where:
-        sql += " WHERE " + " AND ".join(where)
-    sql += " ORDER BY type, target"
+        params.append(int(enabled))
+    sql = _SQL_LIST_TARGETS[target_type is not None, enabled is not None]
 
     with _db_connect() as conn:
-        rows = conn.execute(sql, params).fetchall()
-        return [dict(r) for r in rows]
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        rows = cursor.execute(sql, params).fetchall()
+    return ("[" + ",".join([row[0] for row in rows]) + "]").encode("utf-8")
+
+
+_SQL_LIST_SD = """
+    SELECT target, name, scrape_profile
+    FROM targets
+    WHERE type = ? AND enabled = 1
+    ORDER BY target
+"""
+
+_SQL_LIST_SD_ICMP = """
+    SELECT
+        target,
+        name,
+        scrape_profile,
+        icmp_count,
+        icmp_interval_ms,
+        icmp_timeout_ms,
+        icmp_packet_size,
+        icmp_df
+    FROM targets
+    WHERE type = ? AND enabled = 1
+    ORDER BY target
+"""
+
+
+def _db_list_sd(target_type: str) -> list[dict[str, Any]]:
+    with _db_connect() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        rows = cursor.execute(
+            _SQL_LIST_SD_ICMP if target_type == "icmp" else _SQL_LIST_SD, (target_type,)
+        ).fetchall()
+
+    groups: list[dict[str, Any]] = []
+    if target_type != "icmp":
+        for target, name, scrape_profile in rows:
+            groups.append(
+                {
+                    "targets": [target],
+                    "labels": {
+                        "target_name": (name or "").strip() or target,
+                        "target_type": target_type,
+                        "scrape_profile": (
+                            scrape_profile if scrape_profile in ALLOWED_SCRAPE_PROFILES else DEFAULT_SCRAPE_PROFILE
+                        ),
+                    },
+                }
+            )
+        return groups
+
+    for target, name, scrape_profile, count, interval_ms, timeout_ms, packet_size, df in rows:
+        if df is None:
+            df = ICMP_DEFAULT_DF
+        groups.append(
+            {
+                "targets": [target],
+                "labels": {
+                    "target_name": (name or "").strip() or target,
+                    "target_type": target_type,
+                    "scrape_profile": (
+                        scrape_profile if scrape_profile in ALLOWED_SCRAPE_PROFILES else DEFAULT_SCRAPE_PROFILE
+                    ),
+                    "icmp_count": str(ICMP_DEFAULT_COUNT if count is None else count),
+                    "icmp_interval_ms": str(ICMP_DEFAULT_INTERVAL_MS if interval_ms is None else interval_ms),
+                    "icmp_timeout_ms": str(ICMP_DEFAULT_TIMEOUT_MS if timeout_ms is None else timeout_ms),
+                    "icmp_packet_size": str(ICMP_DEFAULT_PACKET_SIZE if packet_size is None else packet_size),
+                    "icmp_df": "true" if df else "false",
+                },
+            }
+        )
+    return groups
+
+
+def _targets_changed() -> None:
+    global _TARGETS_VERSION
+    with _TARGETS_VERSION_LOCK:
+        _TARGETS_VERSION += 1
+
+
+def _sd_response(target_type: str) -> tuple[bytes, str]:
+    etag = f'{_SD_ETAG_PREFIX}{_TARGETS_VERSION}"'
+    cached = _SD_CACHE.get(target_type)
+    if cached is not None and cached[1] == etag:
+        return cached
+    data = _json_dumps(_db_list_sd(target_type))
+    _SD_CACHE[target_type] = (data, etag)
+    return data, etag
+
+
+_SQL_UPDATE_TARGET = """
+UPDATE targets
+SET
+    name = ?,
+    target = ?,
+    enabled = ?,
+    updated_at = ?,
+    scrape_profile = ?,
+    icmp_count = ?,
+    icmp_interval_ms = ?,
+    icmp_timeout_ms = ?,
+    icmp_packet_size = ?,
+    icmp_df = ?
+WHERE id = ?
+"""
 
 
 def _db_update_target(
@@ -429,35 +477,21 @@ def _db_update_target(
     icmp_df: bool | None,
 ) -> dict[str, Any]:
     now = _now_iso()
-    with _db_connect() as conn:
+    with _db_connect(write=True) as conn:
         try:
             cursor = conn.execute(
-                """
-                UPDATE targets
-                SET
-                    name = ?,
-                    target = ?,
-                    enabled = ?,
-                    updated_at = ?,
-                    scrape_profile = ?,
-                    icmp_count = ?,
-                    icmp_interval_ms = ?,
-                    icmp_timeout_ms = ?,
-                    icmp_packet_size = ?,
-                    icmp_df = ?
-                WHERE id = ?
-                """,
+                _SQL_UPDATE_TARGET,
                 (
                     name,
                     target,
-                    1 if enabled else 0,
+                    int(enabled),
                     now,
                     scrape_profile,
                     icmp_count,
                     icmp_interval_ms,
                     icmp_timeout_ms,
                     icmp_packet_size,
-                    (1 if icmp_df else 0) if icmp_df is not None else None,
+                    _TRIBOOL[icmp_df],
                     target_id,
                 ),
             )
@@ -466,6 +500,7 @@ def _db_update_target(
 
         if cursor.rowcount == 0:
             raise HttpError(HTTPStatus.NOT_FOUND, "target not found")
+    _targets_changed()
 
     updated = _db_get_target(target_id)
     if updated is None:
@@ -473,11 +508,15 @@ def _db_update_target(
     return updated
 
 
+_SQL_DELETE_TARGET = "DELETE FROM targets WHERE id = ?"
+
+
 def _db_delete_target(target_id: int) -> None:
-    with _db_connect() as conn:
-        cursor = conn.execute("DELETE FROM targets WHERE id = ?", (target_id,))
+    with _db_connect(write=True) as conn:
+        cursor = conn.execute(_SQL_DELETE_TARGET, (target_id,))
         if cursor.rowcount == 0:
             raise HttpError(HTTPStatus.NOT_FOUND, "target not found")
+    _targets_changed()
 
 
 def _seed_if_empty() -> None:
@@ -487,7 +526,7 @@ def _seed_if_empty() -> None:
         return
 
     try:
-        seed = json.loads(SEED_FILE.read_text(encoding="utf-8"))
+        seed = _json_loads(SEED_FILE.read_bytes())
     except Exception as exc:  # noqa: BLE001
         print(f"[seed] failed to read seed file {SEED_FILE}: {exc}")
         return
@@ -496,138 +535,154 @@ def _seed_if_empty() -> None:
         print("[seed] seed.json must be a list")
         return
 
+    now = _now_iso()
+    indexes: list[int] = []
+    rows: list[tuple[Any, ...]] = []
     for idx, item in enumerate(seed):
         if not isinstance(item, dict):
             print(f"[seed] skipping item #{idx}: not an object")
             continue
         try:
-            target_type = _normalize_type(item.get("type"))
-            target = _normalize_target(target_type, item.get("target"))
-            name = _normalize_name(item.get("name"))
-            enabled = _bool_from_any(item.get("enabled", True), field="enabled")
-            scrape_profile = _normalize_scrape_profile(item.get("scrape_profile"))
-
-            icmp_count = None
-            icmp_interval_ms = None
-            icmp_timeout_ms = None
-            icmp_packet_size = None
-            icmp_df = None
-
-            icmp_fields_present = any(
-                key in item for key in ("icmp_count", "icmp_interval_ms", "icmp_timeout_ms", "icmp_packet_size", "icmp_df")
+            target_type = normalize_type(item.get("type"))
+            target = normalize_target(target_type, item.get("target"))
+            name = normalize_name(item.get("name"))
+            enabled = bool_from_any(item.get("enabled", True), field="enabled")
+            scrape_profile = normalize_scrape_profile(item.get("scrape_profile"))
+
+            icmp = resolve_icmp_fields(
+                target_type, item, dict.fromkeys(ICMP_FIELDS), scrape_profile=scrape_profile
             )
-            if target_type != "icmp" and icmp_fields_present:
-                raise HttpError(HTTPStatus.BAD_REQUEST, "icmp_* fields are only valid for icmp targets")
-
-            if target_type == "icmp":
-                icmp_count = _optional_int_from_any(item.get("icmp_count"), field="icmp_count")
-                if icmp_count is not None:
-                    icmp_count = _validate_int_range(
-                        icmp_count, field="icmp_count", min_value=ICMP_COUNT_MIN, max_value=ICMP_COUNT_MAX
-                    )
-
-                icmp_interval_ms = _optional_int_from_any(item.get("icmp_interval_ms"), field="icmp_interval_ms")
-                if icmp_interval_ms is not None:
-                    icmp_interval_ms = _validate_int_range(
-                        icmp_interval_ms,
-                        field="icmp_interval_ms",
-                        min_value=ICMP_INTERVAL_MS_MIN,
-                        max_value=ICMP_INTERVAL_MS_MAX,
-                    )
-
-                icmp_timeout_ms = _optional_int_from_any(item.get("icmp_timeout_ms"), field="icmp_timeout_ms")
-                if icmp_timeout_ms is not None:
-                    icmp_timeout_ms = _validate_int_range(
-                        icmp_timeout_ms,
-                        field="icmp_timeout_ms",
-                        min_value=ICMP_TIMEOUT_MS_MIN,
-                        max_value=ICMP_TIMEOUT_MS_MAX,
-                    )
-
-                icmp_packet_size = _optional_int_from_any(item.get("icmp_packet_size"), field="icmp_packet_size")
-                if icmp_packet_size is not None:
-                    icmp_packet_size = _validate_int_range(
-                        icmp_packet_size,
-                        field="icmp_packet_size",
-                        min_value=ICMP_PACKET_SIZE_MIN,
-                        max_value=ICMP_PACKET_SIZE_MAX,
-                    )
-
-                if "icmp_df" in item:
-                    icmp_df = _bool_from_any(item.get("icmp_df"), field="icmp_df")
-
-                effective = _icmp_effective_profile(
-                    icmp_count=icmp_count,
-                    icmp_interval_ms=icmp_interval_ms,
-                    icmp_timeout_ms=icmp_timeout_ms,
-                    icmp_packet_size=icmp_packet_size,
-                    icmp_df=icmp_df,
-                )
-                _validate_icmp_profile_duration(
-                    icmp_count=effective["icmp_count"],
-                    icmp_interval_ms=effective["icmp_interval_ms"],
-                    icmp_timeout_ms=effective["icmp_timeout_ms"],
-                    scrape_profile=_effective_scrape_profile(scrape_profile),
-                )
 
-            _db_insert_target(
-                target_type=target_type,
-                target=target,
-                name=name,
-                enabled=enabled,
-                scrape_profile=scrape_profile,
-                icmp_count=icmp_count,
-                icmp_interval_ms=icmp_interval_ms,
-                icmp_timeout_ms=icmp_timeout_ms,
-                icmp_packet_size=icmp_packet_size,
-                icmp_df=icmp_df,
+            rows.append(
+                _insert_params(
+                    now=now,
+                    target_type=target_type,
+                    target=target,
+                    name=name,
+                    enabled=enabled,
+                    scrape_profile=scrape_profile,
+                    **icmp,
+                )
             )
+            indexes.append(idx)
         except HttpError as exc:
             print(f"[seed] skipping item #{idx}: {exc.message}")
         except Exception as exc:  # noqa: BLE001
             print(f"[seed] skipping item #{idx}: {exc}")
 
+    if not rows:
+        return
+    try:
+        conflicts = _db_insert_targets(rows)
+    except Exception as exc:  # noqa: BLE001
+        print(f"[seed] failed to insert seed targets: {exc}")
+        return
+    for pos in conflicts:
+        print(f"[seed] skipping item #{indexes[pos]}: target already exists")
+
+
+_CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".json": "application/json; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".ico": "image/x-icon",
+}
+
 
 def _content_type_for(path: Path) -> str:
-    suffix = path.suffix.lower()
-    if suffix == ".html":
-        return "text/html; charset=utf-8"
-    if suffix == ".css":
-        return "text/css; charset=utf-8"
-    if suffix == ".js":
-        return "application/javascript; charset=utf-8"
-    if suffix == ".json":
-        return "application/json; charset=utf-8"
-    if suffix == ".svg":
-        return "image/svg+xml"
-    if suffix == ".png":
-        return "image/png"
-    if suffix == ".ico":
-        return "image/x-icon"
-    return "application/octet-stream"
+    return _CONTENT_TYPES.get(path.suffix.lower(), "application/octet-stream")
+
+
+def _read_static(path: Path) -> tuple[bytes, str]:
+    try:
+        st = os.stat(path)
+    except OSError as exc:
+        raise HttpError(HTTPStatus.NOT_FOUND, "not found") from exc
+    if not stat.S_ISREG(st.st_mode):
+        raise HttpError(HTTPStatus.NOT_FOUND, "not found")
+
+    key = str(path)
+    cached = _STATIC_CACHE.get(key)
+    if cached is not None and cached[0] == st.st_mtime_ns:
+        return cached[1], cached[2]
+
+    data = path.read_bytes()
+    content_type = _content_type_for(path)
+    _STATIC_CACHE[key] = (st.st_mtime_ns, data, content_type)
+    return data, content_type
 
 
 class Handler(BaseHTTPRequestHandler):
     server_version = "home-noc-target-manager/1.0"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    timeout = 60
+    _body_read = False
+    _slot_held = False
 
     def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
         print("[%s] %s" % (self.log_date_time_string(), format % args))
 
+    def handle_one_request(self) -> None:
+        try:
+            super().handle_one_request()
+        finally:
+            if self._slot_held:
+                self._slot_held = False
+                _REQUEST_SLOTS.release()
+
+    def parse_request(self) -> bool:
+        self._body_read = False
+        _REQUEST_SLOTS.acquire()
+        self._slot_held = True
+        return super().parse_request()
+
+    def _send_bytes(
+        self,
+        status: int,
+        data: bytes,
+        *,
+        content_type: str | None = None,
+        etag: str | None = None,
+    ) -> None:
+        self.log_request(status)
+        if "Transfer-Encoding" in self.headers or (
+            not self._body_read and self.headers.get("Content-Length", "") not in ("", "0")
+        ):
+            self.close_connection = True
+
+        head = (
+            f"{self.protocol_version} {int(status)} {self.responses[status][0]}\r\n"
+            f"Server: {self.version_string()}\r\n"
+            f"Date: {self.date_time_string()}\r\n"
+        )
+        if content_type is not None:
+            head += f"Content-Type: {content_type}\r\n"
+        if status != HTTPStatus.NO_CONTENT and status != HTTPStatus.NOT_MODIFIED:
+            head += f"Content-Length: {len(data)}\r\n"
+        if etag is not None:
+            head += f"ETag: {etag}\r\n"
+        if self.close_connection:
+            head += "Connection: close\r\n"
+        self.wfile.write(head.encode("latin-1") + b"\r\n" + data)
+
     def _send_json(self, status: int, payload: Any) -> None:
-        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json; charset=utf-8")
-        self.send_header("Content-Length", str(len(data)))
-        self.end_headers()
-        self.wfile.write(data)
+        self._send_bytes(status, _json_dumps(payload), content_type="application/json; charset=utf-8")
+
+    def _send_json_bytes(self, status: int, data: bytes, *, etag: str | None = None) -> None:
+        self._send_bytes(status, data, content_type="application/json; charset=utf-8", etag=etag)
+
+    def _etag_matches(self, etag: str) -> bool:
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        return any(tag.strip() in (etag, "*") for tag in header.split(","))
 
     def _send_text(self, status: int, text: str, *, content_type: str = "text/plain; charset=utf-8") -> None:
-        data = text.encode("utf-8")
-        self.send_response(status)
-        self.send_header("Content-Type", content_type)
-        self.send_header("Content-Length", str(len(data)))
-        self.end_headers()
-        self.wfile.write(data)
+        self._send_bytes(status, text.encode("utf-8"), content_type=content_type)
 
     def _read_json_body(self) -> dict[str, Any]:
         length_raw = self.headers.get("Content-Length")
@@ -637,9 +692,12 @@ class Handler(BaseHTTPRequestHandler):
             length = int(length_raw)
         except ValueError as exc:
             raise HttpError(HTTPStatus.BAD_REQUEST, "invalid Content-Length") from exc
+        if length < 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
         body = self.rfile.read(length)
+        self._body_read = True
         try:
-            payload = json.loads(body.decode("utf-8"))
+            payload = _json_loads(body)
         except Exception as exc:  # noqa: BLE001
             raise HttpError(HTTPStatus.BAD_REQUEST, "invalid JSON") from exc
         if not isinstance(payload, dict):
@@ -650,23 +708,20 @@ class Handler(BaseHTTPRequestHandler):
         rel = Path(rel_path)
         if rel.is_absolute() or ".." in rel.parts:
             raise HttpError(HTTPStatus.NOT_FOUND, "not found")
-        path = (STATIC_DIR / rel).resolve()
-        if not str(path).startswith(str(STATIC_DIR.resolve())):
-            raise HttpError(HTTPStatus.NOT_FOUND, "not found")
-        if not path.exists() or not path.is_file():
+        path = (_STATIC_ROOT / rel).resolve()
+        if not str(path).startswith(str(_STATIC_ROOT)):
             raise HttpError(HTTPStatus.NOT_FOUND, "not found")
 
-        data = path.read_bytes()
-        self.send_response(HTTPStatus.OK)
-        self.send_header("Content-Type", _content_type_for(path))
-        self.send_header("Content-Length", str(len(data)))
-        self.end_headers()
-        self.wfile.write(data)
+        data, content_type = _read_static(path)
+        self._send_bytes(HTTPStatus.OK, data, content_type=content_type)
 
     def do_GET(self) -> None:  # noqa: N802
         try:
-            parsed = urllib.parse.urlparse(self.path)
-            path = parsed.path
+            if self.path == "/healthz":
+                self._send_text(HTTPStatus.OK, "ok\n")
+                return
+
+            path, _, raw_query = self.path.partition("?")
 
             if path == "/healthz":
                 self._send_text(HTTPStatus.OK, "ok\n")
@@ -681,52 +736,24 @@ class Handler(BaseHTTPRequestHandler):
                 return
 
             if path in ("/sd/http", "/sd/tcp", "/sd/dns", "/sd/icmp"):
-                target_type = path.split("/")[-1]
-                rows = _db_list_targets(target_type=target_type, enabled=True)
-                groups = []
-                for row in rows:
-                    name = (row.get("name") or "").strip() or row["target"]
-                    labels = {
-                        "target_name": name,
-                        "target_type": target_type,
-                        "scrape_profile": _effective_scrape_profile(row.get("scrape_profile")),
-                    }
-                    if target_type == "icmp":
-                        effective = _icmp_effective_profile(
-                            icmp_count=row.get("icmp_count"),
-                            icmp_interval_ms=row.get("icmp_interval_ms"),
-                            icmp_timeout_ms=row.get("icmp_timeout_ms"),
-                            icmp_packet_size=row.get("icmp_packet_size"),
-                            icmp_df=(None if row.get("icmp_df") is None else bool(row.get("icmp_df"))),
-                        )
-                        labels.update(
-                            {
-                                "icmp_count": str(effective["icmp_count"]),
-                                "icmp_interval_ms": str(effective["icmp_interval_ms"]),
-                                "icmp_timeout_ms": str(effective["icmp_timeout_ms"]),
-                                "icmp_packet_size": str(effective["icmp_packet_size"]),
-                                "icmp_df": "true" if effective["icmp_df"] else "false",
-                            }
-                        )
-                    groups.append(
-                        {
-                            "targets": [row["target"]],
-                            "labels": labels,
-                        }
-                    )
-                self._send_json(HTTPStatus.OK, groups)
+                data, etag = _sd_response(path.removeprefix("/sd/"))
+                if self._etag_matches(etag):
+                    self._send_bytes(HTTPStatus.NOT_MODIFIED, b"", etag=etag)
+                    return
+                self._send_json_bytes(HTTPStatus.OK, data, etag=etag)
                 return
 
             if path == "/api/targets":
-                query = urllib.parse.parse_qs(parsed.query or "")
+                query = parse_qs(raw_query)
                 q_type = query.get("type", [None])[0]
                 q_enabled = query.get("enabled", [None])[0]
 
-                target_type = _normalize_type(q_type) if q_type is not None else None
-                enabled = None if q_enabled is None else _bool_from_any(q_enabled, field="enabled")
+                target_type = normalize_type(q_type) if q_type is not None else None
+                enabled = None if q_enabled is None else bool_from_any(q_enabled, field="enabled")
 
-                items = _db_list_targets(target_type=target_type, enabled=enabled)
-                self._send_json(HTTPStatus.OK, items)
+                self._send_json_bytes(
+                    HTTPStatus.OK, _db_list_targets_json(target_type=target_type, enabled=enabled)
+                )
                 return
 
             raise HttpError(HTTPStatus.NOT_FOUND, "not found")
@@ -737,79 +764,19 @@ class Handler(BaseHTTPRequestHandler):
 
     def do_POST(self) -> None:  # noqa: N802
         try:
-            parsed = urllib.parse.urlparse(self.path)
-            if parsed.path != "/api/targets":
+            if self.path.partition("?")[0] != "/api/targets":
                 raise HttpError(HTTPStatus.NOT_FOUND, "not found")
 
             body = self._read_json_body()
-            target_type = _normalize_type(body.get("type"))
-            target = _normalize_target(target_type, body.get("target"))
-            name = _normalize_name(body.get("name"))
-            enabled = _bool_from_any(body.get("enabled", True), field="enabled")
-            scrape_profile = _normalize_scrape_profile(body.get("scrape_profile"))
-
-            icmp_count = None
-            icmp_interval_ms = None
-            icmp_timeout_ms = None
-            icmp_packet_size = None
-            icmp_df = None
-
-            icmp_fields_present = any(
-                key in body for key in ("icmp_count", "icmp_interval_ms", "icmp_timeout_ms", "icmp_packet_size", "icmp_df")
+            target_type = normalize_type(body.get("type"))
+            target = normalize_target(target_type, body.get("target"))
+            name = normalize_name(body.get("name"))
+            enabled = bool_from_any(body.get("enabled", True), field="enabled")
+            scrape_profile = normalize_scrape_profile(body.get("scrape_profile"))
+
+            icmp = resolve_icmp_fields(
+                target_type, body, dict.fromkeys(ICMP_FIELDS), scrape_profile=scrape_profile
             )
-            if target_type != "icmp" and icmp_fields_present:
-                raise HttpError(HTTPStatus.BAD_REQUEST, "icmp_* fields are only valid for icmp targets")
-
-            if target_type == "icmp":
-                icmp_count = _optional_int_from_any(body.get("icmp_count"), field="icmp_count")
-                if icmp_count is not None:
-                    icmp_count = _validate_int_range(
-                        icmp_count, field="icmp_count", min_value=ICMP_COUNT_MIN, max_value=ICMP_COUNT_MAX
-                    )
-
-                icmp_interval_ms = _optional_int_from_any(body.get("icmp_interval_ms"), field="icmp_interval_ms")
-                if icmp_interval_ms is not None:
-                    icmp_interval_ms = _validate_int_range(
-                        icmp_interval_ms,
-                        field="icmp_interval_ms",
-                        min_value=ICMP_INTERVAL_MS_MIN,
-                        max_value=ICMP_INTERVAL_MS_MAX,
-                    )
-
-                icmp_timeout_ms = _optional_int_from_any(body.get("icmp_timeout_ms"), field="icmp_timeout_ms")
-                if icmp_timeout_ms is not None:
-                    icmp_timeout_ms = _validate_int_range(
-                        icmp_timeout_ms,
-                        field="icmp_timeout_ms",
-                        min_value=ICMP_TIMEOUT_MS_MIN,
-                        max_value=ICMP_TIMEOUT_MS_MAX,
-                    )
-
-                icmp_packet_size = _optional_int_from_any(body.get("icmp_packet_size"), field="icmp_packet_size")
-                if icmp_packet_size is not None:
-                    icmp_packet_size = _validate_int_range(
-                        icmp_packet_size,
-                        field="icmp_packet_size",
-                        min_value=ICMP_PACKET_SIZE_MIN,
-                        max_value=ICMP_PACKET_SIZE_MAX,
-                    )
-
-                if "icmp_df" in body:
-                    icmp_df = _bool_from_any(body.get("icmp_df"), field="icmp_df")
-
-                effective = _icmp_effective_profile(
-                    icmp_count=icmp_count,
-                    icmp_interval_ms=icmp_interval_ms,
-                    icmp_timeout_ms=icmp_timeout_ms,
-                    icmp_packet_size=icmp_packet_size,
-                    icmp_df=icmp_df,
-                )
-                _validate_icmp_profile_duration(
-                    icmp_count=effective["icmp_count"],
-                    icmp_interval_ms=effective["icmp_interval_ms"],
-                    icmp_timeout_ms=effective["icmp_timeout_ms"],
-                    scrape_profile=_effective_scrape_profile(scrape_profile),
-                )
 
             target_id = _db_insert_target(
                 target_type=target_type,
@@ -817,11 +784,7 @@ class Handler(BaseHTTPRequestHandler):
                 name=name,
                 enabled=enabled,
                 scrape_profile=scrape_profile,
-                icmp_count=icmp_count,
-                icmp_interval_ms=icmp_interval_ms,
-                icmp_timeout_ms=icmp_timeout_ms,
-                icmp_packet_size=icmp_packet_size,
-                icmp_df=icmp_df,
+                **icmp,
             )
             created = _db_get_target(target_id)
             self._send_json(HTTPStatus.CREATED, created)
@@ -832,12 +795,12 @@ class Handler(BaseHTTPRequestHandler):
 
     def do_PATCH(self) -> None:  # noqa: N802
         try:
-            parsed = urllib.parse.urlparse(self.path)
-            if not parsed.path.startswith("/api/targets/"):
+            path = self.path.partition("?")[0]
+            if not path.startswith("/api/targets/"):
                 raise HttpError(HTTPStatus.NOT_FOUND, "not found")
 
             try:
-                target_id = int(parsed.path.removeprefix("/api/targets/"))
+                target_id = int(path[len("/api/targets/"):])
             except ValueError as exc:
                 raise HttpError(HTTPStatus.NOT_FOUND, "not found") from exc
 
@@ -847,85 +810,30 @@ class Handler(BaseHTTPRequestHandler):
 
             body = self._read_json_body()
 
-            name = existing.get("name")
+            target_type = existing["type"]
+            name = existing["name"]
             target = existing["target"]
             enabled = bool(existing["enabled"])
-            scrape_profile = existing.get("scrape_profile")
-            icmp_count = existing.get("icmp_count")
-            icmp_interval_ms = existing.get("icmp_interval_ms")
-            icmp_timeout_ms = existing.get("icmp_timeout_ms")
-            icmp_packet_size = existing.get("icmp_packet_size")
-            icmp_df = None if existing.get("icmp_df") is None else bool(existing.get("icmp_df"))
+            scrape_profile = existing["scrape_profile"]
+            icmp_df = existing["icmp_df"]
+            icmp: dict[str, Any] = {
+                "icmp_count": existing["icmp_count"],
+                "icmp_interval_ms": existing["icmp_interval_ms"],
+                "icmp_timeout_ms": existing["icmp_timeout_ms"],
+                "icmp_packet_size": existing["icmp_packet_size"],
+                "icmp_df": None if icmp_df is None else bool(icmp_df),
+            }
 
             if "name" in body:
-                name = _normalize_name(body.get("name"))
+                name = normalize_name(body.get("name"))
             if "enabled" in body:
-                enabled = _bool_from_any(body.get("enabled"), field="enabled")
+                enabled = bool_from_any(body.get("enabled"), field="enabled")
             if "target" in body:
-                target = _normalize_target(existing["type"], body.get("target"))
+                target = normalize_target(target_type, body.get("target"))
             if "scrape_profile" in body:
-                scrape_profile = _normalize_scrape_profile(body.get("scrape_profile"))
+                scrape_profile = normalize_scrape_profile(body.get("scrape_profile"))
 
-            icmp_fields_present = any(
-                key in body for key in ("icmp_count", "icmp_interval_ms", "icmp_timeout_ms", "icmp_packet_size", "icmp_df")
-            )
-            if existing["type"] != "icmp" and icmp_fields_present:
-                raise HttpError(HTTPStatus.BAD_REQUEST, "icmp_* fields are only valid for icmp targets")
-
-            if existing["type"] == "icmp":
-                if "icmp_count" in body:
-                    icmp_count = _optional_int_from_any(body.get("icmp_count"), field="icmp_count")
-                    if icmp_count is not None:
-                        icmp_count = _validate_int_range(
-                            icmp_count, field="icmp_count", min_value=ICMP_COUNT_MIN, max_value=ICMP_COUNT_MAX
-                        )
-
-                if "icmp_interval_ms" in body:
-                    icmp_interval_ms = _optional_int_from_any(body.get("icmp_interval_ms"), field="icmp_interval_ms")
-                    if icmp_interval_ms is not None:
-                        icmp_interval_ms = _validate_int_range(
-                            icmp_interval_ms,
-                            field="icmp_interval_ms",
-                            min_value=ICMP_INTERVAL_MS_MIN,
-                            max_value=ICMP_INTERVAL_MS_MAX,
-                        )
-
-                if "icmp_timeout_ms" in body:
-                    icmp_timeout_ms = _optional_int_from_any(body.get("icmp_timeout_ms"), field="icmp_timeout_ms")
-                    if icmp_timeout_ms is not None:
-                        icmp_timeout_ms = _validate_int_range(
-                            icmp_timeout_ms,
-                            field="icmp_timeout_ms",
-                            min_value=ICMP_TIMEOUT_MS_MIN,
-                            max_value=ICMP_TIMEOUT_MS_MAX,
-                        )
-
-                if "icmp_packet_size" in body:
-                    icmp_packet_size = _optional_int_from_any(body.get("icmp_packet_size"), field="icmp_packet_size")
-                    if icmp_packet_size is not None:
-                        icmp_packet_size = _validate_int_range(
-                            icmp_packet_size,
-                            field="icmp_packet_size",
-                            min_value=ICMP_PACKET_SIZE_MIN,
-                            max_value=ICMP_PACKET_SIZE_MAX,
-                        )
-
-                if "icmp_df" in body:
-                    icmp_df = _bool_from_any(body.get("icmp_df"), field="icmp_df") if body.get("icmp_df") is not None else None
-
-                effective = _icmp_effective_profile(
-                    icmp_count=icmp_count,
-                    icmp_interval_ms=icmp_interval_ms,
-                    icmp_timeout_ms=icmp_timeout_ms,
-                    icmp_packet_size=icmp_packet_size,
-                    icmp_df=icmp_df,
-                )
-                _validate_icmp_profile_duration(
-                    icmp_count=effective["icmp_count"],
-                    icmp_interval_ms=effective["icmp_interval_ms"],
-                    icmp_timeout_ms=effective["icmp_timeout_ms"],
-                    scrape_profile=_effective_scrape_profile(scrape_profile),
-                )
+            icmp = resolve_icmp_fields(target_type, body, icmp, scrape_profile=scrape_profile)
 
             updated = _db_update_target(
                 target_id,
@@ -933,11 +841,7 @@ class Handler(BaseHTTPRequestHandler):
                 target=target,
                 enabled=enabled,
                 scrape_profile=scrape_profile,
-                icmp_count=icmp_count,
-                icmp_interval_ms=icmp_interval_ms,
-                icmp_timeout_ms=icmp_timeout_ms,
-                icmp_packet_size=icmp_packet_size,
-                icmp_df=icmp_df,
+                **icmp,
             )
             self._send_json(HTTPStatus.OK, updated)
         except HttpError as exc:
@@ -947,35 +851,39 @@ class Handler(BaseHTTPRequestHandler):
 
     def do_DELETE(self) -> None:  # noqa: N802
         try:
-            parsed = urllib.parse.urlparse(self.path)
-            if not parsed.path.startswith("/api/targets/"):
+            path = self.path.partition("?")[0]
+            if not path.startswith("/api/targets/"):
                 raise HttpError(HTTPStatus.NOT_FOUND, "not found")
             try:
-                target_id = int(parsed.path.removeprefix("/api/targets/"))
+                target_id = int(path[len("/api/targets/"):])
             except ValueError as exc:
                 raise HttpError(HTTPStatus.NOT_FOUND, "not found") from exc
 
             _db_delete_target(target_id)
-            self.send_response(HTTPStatus.NO_CONTENT)
-            self.end_headers()
+            self._send_bytes(HTTPStatus.NO_CONTENT, b"")
         except HttpError as exc:
             self._send_json(int(exc.status), {"error": exc.message})
         except Exception as exc:  # noqa: BLE001
             self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(exc)})
 
 
+class Server(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
 def main() -> None:
     bind = os.environ.get("BIND", "127.0.0.1")
     port = int(os.environ.get("PORT", "8080"))
 
     _db_init()
     _seed_if_empty()
+    _db_analyze()
 
     print(f"[server] DB_PATH={DB_PATH}")
     print(f"[server] STATIC_DIR={STATIC_DIR}")
-    print(f"[server] listening on http://{bind}:{port}")
+    print(f"[server] listening on http://{bind}:{port} (workers={WORKERS})")
 
-    server = ThreadingHTTPServer((bind, port), Handler)
+    server = Server((bind, port), Handler)
     server.serve_forever()
 
 
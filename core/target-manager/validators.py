@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import functools
+import re
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import urlparse, urlunparse
+
+ALLOWED_TYPES = {"http", "tcp", "dns", "icmp"}
+
+ICMP_DEFAULT_COUNT = 4
+ICMP_DEFAULT_INTERVAL_MS = 1000
+ICMP_DEFAULT_TIMEOUT_MS = 1000
+ICMP_DEFAULT_PACKET_SIZE = 56
+ICMP_DEFAULT_DF = False
+
+ICMP_COUNT_MIN = 1
+ICMP_COUNT_MAX = 500
+ICMP_INTERVAL_MS_MIN = 10
+ICMP_INTERVAL_MS_MAX = 1000
+ICMP_TIMEOUT_MS_MIN = 200
+ICMP_TIMEOUT_MS_MAX = 5000
+ICMP_PACKET_SIZE_MIN = 0
+ICMP_PACKET_SIZE_MAX = 1472
+
+ICMP_INT_FIELDS = (
+    ("icmp_count", ICMP_COUNT_MIN, ICMP_COUNT_MAX),
+    ("icmp_interval_ms", ICMP_INTERVAL_MS_MIN, ICMP_INTERVAL_MS_MAX),
+    ("icmp_timeout_ms", ICMP_TIMEOUT_MS_MIN, ICMP_TIMEOUT_MS_MAX),
+    ("icmp_packet_size", ICMP_PACKET_SIZE_MIN, ICMP_PACKET_SIZE_MAX),
+)
+ICMP_FIELDS = ("icmp_count", "icmp_interval_ms", "icmp_timeout_ms", "icmp_packet_size", "icmp_df")
+
+ALLOWED_SCRAPE_PROFILES = {"1s", "5s", "15s", "60s"}
+DEFAULT_SCRAPE_PROFILE = "15s"
+
+ICMP_PROFILE_ESTIMATED_MS_MAX_BY_SCRAPE_PROFILE = {
+    "1s": 900,
+    "5s": 4500,
+    "15s": 9000,
+    "60s": 9000,
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        self.status = status
+        self.message = message
+        super().__init__(message)
+
+
+_WS_RE = re.compile(r"\s")
+
+_BOOL_MAP: dict[Any, bool] = {
+    True: True,
+    False: False,
+    "true": True,
+    "1": True,
+    "yes": True,
+    "y": True,
+    "on": True,
+    "false": False,
+    "0": False,
+    "no": False,
+    "n": False,
+    "off": False,
+}
+
+
+def bool_from_any(value: Any, *, field: str) -> bool:
+    value_type = type(value)
+    if value_type is str:
+        value = value.strip().lower()
+    elif value_type is not bool and value_type is not int:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be a boolean")
+    result = _BOOL_MAP.get(value)
+    if result is None:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be a boolean")
+    return result
+
+
+def int_from_any(value: Any, *, field: str) -> int:
+    value_type = type(value)
+    if value_type is int:
+        return value
+    if value_type is str:
+        raw = value.strip()
+        if raw.isdigit() and raw.isascii():
+            return int(raw)
+    raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be an integer")
+
+
+def optional_int_from_any(value: Any, *, field: str) -> int | None:
+    if value is None:
+        return None
+    if isinstance(value, str) and value.strip() == "":
+        return None
+    return int_from_any(value, field=field)
+
+
+def validate_int_range(value: int, *, field: str, min_value: int, max_value: int) -> int:
+    if not (min_value <= value <= max_value):
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be in range {min_value}..{max_value}")
+    return value
+
+
+def normalize_scrape_profile(raw_profile: Any) -> str | None:
+    if raw_profile is None:
+        return None
+    if not isinstance(raw_profile, str):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "scrape_profile must be a string")
+    profile = raw_profile.strip()
+    if profile == "":
+        return None
+    if profile not in ALLOWED_SCRAPE_PROFILES:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "scrape_profile must be one of: 1s, 5s, 15s, 60s")
+    return profile
+
+
+def effective_scrape_profile(profile: Any) -> str:
+    if isinstance(profile, str) and profile in ALLOWED_SCRAPE_PROFILES:
+        return profile
+    return DEFAULT_SCRAPE_PROFILE
+
+
+@dataclass(slots=True, frozen=True)
+class IcmpProfile:
+    count: int
+    interval_ms: int
+    timeout_ms: int
+    packet_size: int
+    df: bool
+
+
+def icmp_effective_profile(
+    *,
+    icmp_count: int | None,
+    icmp_interval_ms: int | None,
+    icmp_timeout_ms: int | None,
+    icmp_packet_size: int | None,
+    icmp_df: bool | None,
+) -> IcmpProfile:
+    return IcmpProfile(
+        ICMP_DEFAULT_COUNT if icmp_count is None else icmp_count,
+        ICMP_DEFAULT_INTERVAL_MS if icmp_interval_ms is None else icmp_interval_ms,
+        ICMP_DEFAULT_TIMEOUT_MS if icmp_timeout_ms is None else icmp_timeout_ms,
+        ICMP_DEFAULT_PACKET_SIZE if icmp_packet_size is None else icmp_packet_size,
+        ICMP_DEFAULT_DF if icmp_df is None else icmp_df,
+    )
+
+
+def parse_icmp_fields(src: dict[str, Any]) -> dict[str, Any]:
+    values: dict[str, Any] = {}
+    for field, min_value, max_value in ICMP_INT_FIELDS:
+        if field not in src:
+            continue
+        value = optional_int_from_any(src[field], field=field)
+        if value is not None:
+            value = validate_int_range(value, field=field, min_value=min_value, max_value=max_value)
+        values[field] = value
+    if "icmp_df" in src:
+        raw_df = src["icmp_df"]
+        values["icmp_df"] = None if raw_df is None else bool_from_any(raw_df, field="icmp_df")
+    return values
+
+
+def validate_icmp_profile_duration(
+    *,
+    icmp_count: int,
+    icmp_interval_ms: int,
+    icmp_timeout_ms: int,
+    scrape_profile: str,
+) -> None:
+    estimated_ms = max(0, icmp_count - 1) * icmp_interval_ms + icmp_timeout_ms
+    max_ms = ICMP_PROFILE_ESTIMATED_MS_MAX_BY_SCRAPE_PROFILE.get(
+        scrape_profile, ICMP_PROFILE_ESTIMATED_MS_MAX_BY_SCRAPE_PROFILE[DEFAULT_SCRAPE_PROFILE]
+    )
+    if estimated_ms > max_ms:
+        raise HttpError(
+            HTTPStatus.BAD_REQUEST,
+            f"icmp profile too long for scrape_profile={scrape_profile} (estimated {estimated_ms}ms > {max_ms}ms)",
+        )
+
+
+def resolve_icmp_fields(
+    target_type: str,
+    src: dict[str, Any],
+    current: dict[str, Any],
+    *,
+    scrape_profile: str | None,
+) -> dict[str, Any]:
+    if target_type != "icmp":
+        if any(key in src for key in ICMP_FIELDS):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "icmp_* fields are only valid for icmp targets")
+        return current
+
+    icmp = {**current, **parse_icmp_fields(src)}
+    effective = icmp_effective_profile(**icmp)
+    validate_icmp_profile_duration(
+        icmp_count=effective.count,
+        icmp_interval_ms=effective.interval_ms,
+        icmp_timeout_ms=effective.timeout_ms,
+        scrape_profile=effective_scrape_profile(scrape_profile),
+    )
+    return icmp
+
+
+def normalize_type(raw_type: Any) -> str:
+    if not isinstance(raw_type, str):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "type must be a string")
+    target_type = raw_type.strip().lower()
+    if target_type not in ALLOWED_TYPES:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "type must be one of: http, tcp, dns, icmp")
+    return target_type
+
+
+def normalize_name(raw_name: Any) -> str | None:
+    if raw_name is None:
+        return None
+    if not isinstance(raw_name, str):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "name must be a string")
+    name = raw_name.strip()
+    return name or None
+
+
+def _validate_port(port: int) -> None:
+    if not (1 <= port <= 65535):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "port must be in range 1..65535")
+
+
+def _normalize_host_port(raw: str, *, default_port: int) -> str:
+    if "://" in raw:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "target must not include a URL scheme")
+    if _WS_RE.search(raw):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "target must not contain whitespace")
+    if "/" in raw or "?" in raw or "#" in raw:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "target must be in host:port format")
+
+    if raw.startswith("["):
+        end = raw.find("]")
+        if end == -1:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "invalid IPv6 target: missing closing ']'")
+        host = raw[1:end].strip()
+        rest = raw[end + 1 :]
+        if not host:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: empty host")
+
+        if rest == "":
+            port = default_port
+        elif rest.startswith(":"):
+            port_str = rest[1:].strip()
+            if not port_str.isdigit():
+                raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: port must be numeric")
+            port = int(port_str)
+        else:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: unexpected characters after ']'")
+
+        _validate_port(port)
+        return f"[{host.lower()}]:{port}"
+
+    colon_count = raw.count(":")
+    if colon_count == 0:
+        host = raw.strip()
+        port = default_port
+    elif colon_count == 1:
+        host, port_str = raw.rsplit(":", 1)
+        host = host.strip()
+        port_str = port_str.strip()
+        if not port_str.isdigit():
+            raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: port must be numeric")
+        port = int(port_str)
+    else:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: IPv6 must be in [addr]:port format")
+
+    if not host:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "invalid target: empty host")
+    _validate_port(port)
+    return f"{host.lower()}:{port}"
+
+
+def _normalize_http_target(target: str) -> str:
+    if "://" not in target:
+        target = "https://" + target
+    parsed = urlparse(target)
+    scheme = parsed.scheme.lower()
+    if scheme not in ("http", "https"):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "http target scheme must be http or https")
+    if not parsed.netloc:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "http target must include a hostname")
+
+    return urlunparse(
+        (
+            scheme,
+            parsed.netloc.lower(),
+            parsed.path,
+            parsed.params,
+            parsed.query,
+            parsed.fragment,
+        )
+    )
+
+
+def normalize_target(target_type: str, raw_target: Any) -> str:
+    if not isinstance(raw_target, str):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "target must be a string")
+    return _normalize_target(target_type, raw_target)
+
+
+@functools.lru_cache(maxsize=1024)
+def _normalize_target(target_type: str, raw_target: str) -> str:
+    target = raw_target.strip()
+    if not target:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "target must not be empty")
+
+    if target_type == "http":
+        return _normalize_http_target(target)
+
+    if target_type == "tcp":
+        return _normalize_host_port(target, default_port=443)
+
+    if target_type == "dns":
+        return _normalize_host_port(target, default_port=53)
+
+    if target_type == "icmp":
+        if "://" in target:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "icmp target must not include a URL scheme")
+        if _WS_RE.search(target):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "target must not contain whitespace")
+        if "/" in target or "?" in target or "#" in target:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "icmp target must be a hostname or IP address")
+
+        port_sep = target.rfind(":")
+        if port_sep > 0 and target[port_sep + 1 :].isdigit():
+            host = target[:port_sep]
+            if ":" not in host or (host[0] == "[" and host[-1] == "]" and len(host) > 2):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "icmp target must not include a port")
+
+        if target.startswith("[") and target.endswith("]"):
+            target = target[1:-1]
+
+        return target.lower()
+
+    raise HttpError(HTTPStatus.BAD_REQUEST, "unsupported type")
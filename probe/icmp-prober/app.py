@@ -2,9 +2,13 @@ from __future__ import annotations
 
 import os
 import re
+import selectors
+import socket
+import struct
 import subprocess
 import math
 import time
+import threading
 import urllib.parse
 from http import HTTPStatus
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
@@ -24,19 +28,84 @@ MAX_TIMEOUT_MS = 5000
 MIN_PACKET_SIZE = 0
 MAX_PACKET_SIZE = 1472
 
+WORKERS = max(1, int(os.environ.get("WORKERS", "64")))
+
+_REQUEST_SLOTS = threading.BoundedSemaphore(WORKERS)
+
 _PACKET_STATS_RE = re.compile(
-    r"(?m)^(?P<tx>\d+)\s+packets\s+transmitted,\s+"
-    r"(?P<rx>\d+)\s+(?:packets\s+)?received,.*?"
-    r"(?P<loss>[\d.]+)%\s+packet\s+loss"
+    r"(\d+)\s+packets\s+transmitted,\s+"
+    r"(\d+)\s+(?:packets\s+)?received,.*?"
+    r"([\d.]+)%\s+packet\s+loss"
 )
 
-_RTT_RE = re.compile(
-    r"(?m)^(?:rtt|round-trip)\s+min/avg/max/(?:mdev|stddev)\s*=\s*"
-    r"(?P<min>[\d.]+)/(?P<avg>[\d.]+)/(?P<max>[\d.]+)/(?P<stddev>[\d.]+)\s*ms"
+_QUERY_KEYS = frozenset(("target", "count", "interval_ms", "timeout_ms", "packet_size", "df", "debug"))
+
+_TARGET_RE = re.compile(r"(?:\[([^\s\[\]]+)\]|([^\s\[\]]+))\Z")
+
+_BOOL_MAP: dict[Any, bool] = {
+    True: True,
+    False: False,
+    "true": True,
+    "1": True,
+    "yes": True,
+    "y": True,
+    "on": True,
+    "false": False,
+    "0": False,
+    "no": False,
+    "n": False,
+    "off": False,
+}
+
+_ICMP_ECHO_REQUEST = 8
+_ICMP_ECHO_REPLY = 0
+_ICMP6_ECHO_REQUEST = 128
+_ICMP6_ECHO_REPLY = 129
+_IP_MTU_DISCOVER = getattr(socket, "IP_MTU_DISCOVER", 10)
+_IP_PMTUDISC_DO = getattr(socket, "IP_PMTUDISC_DO", 2)
+_ICMP_PAYLOAD = bytes(range(256)) * (MAX_PACKET_SIZE // 256 + 1)
+
+_METRICS_TEMPLATE = (
+    b"# HELP home_noc_icmp_probe_success 1 if at least one reply was received.\n"
+    b"# TYPE home_noc_icmp_probe_success gauge\n"
+    b"home_noc_icmp_probe_success %d\n"
+    b"# HELP home_noc_icmp_packets_sent Number of ICMP echo requests sent in the last probe.\n"
+    b"# TYPE home_noc_icmp_packets_sent gauge\n"
+    b"home_noc_icmp_packets_sent %d\n"
+    b"# HELP home_noc_icmp_packets_received Number of ICMP echo replies received in the last probe.\n"
+    b"# TYPE home_noc_icmp_packets_received gauge\n"
+    b"home_noc_icmp_packets_received %d\n"
+    b"# HELP home_noc_icmp_packet_loss_ratio Packet loss ratio (0..1) for the last probe burst.\n"
+    b"# TYPE home_noc_icmp_packet_loss_ratio gauge\n"
+    b"home_noc_icmp_packet_loss_ratio %.6f\n"
+    b"# HELP home_noc_icmp_rtt_min_seconds Minimum round-trip time (seconds) in the last probe burst.\n"
+    b"# TYPE home_noc_icmp_rtt_min_seconds gauge\n"
+    b"home_noc_icmp_rtt_min_seconds %b\n"
+    b"# HELP home_noc_icmp_rtt_avg_seconds Average round-trip time (seconds) in the last probe burst.\n"
+    b"# TYPE home_noc_icmp_rtt_avg_seconds gauge\n"
+    b"home_noc_icmp_rtt_avg_seconds %b\n"
+    b"# HELP home_noc_icmp_rtt_max_seconds Maximum round-trip time (seconds) in the last probe burst.\n"
+    b"# TYPE home_noc_icmp_rtt_max_seconds gauge\n"
+    b"home_noc_icmp_rtt_max_seconds %b\n"
+    b"# HELP home_noc_icmp_rtt_stddev_seconds Round-trip time stddev (seconds) in the last probe burst.\n"
+    b"# TYPE home_noc_icmp_rtt_stddev_seconds gauge\n"
+    b"home_noc_icmp_rtt_stddev_seconds %b\n"
+    b"# HELP home_noc_icmp_probe_duration_seconds Total time spent running the last probe.\n"
+    b"# TYPE home_noc_icmp_probe_duration_seconds gauge\n"
+    b"home_noc_icmp_probe_duration_seconds %.6f\n"
 )
 
-_REPLY_TIME_RE = re.compile(r"(?m)^\s*\d+\s+bytes\s+from\s+.+?\s+time[=<](?P<ms>[\d.]+)\s*ms\s*$")
-_REPLY_RE = re.compile(r"(?m)^\s*\d+\s+bytes\s+from\s+.+?\s+icmp_seq=\d+")
+_PING4_BASE = ("ping", "-4", "-n")
+_PING6_BASE = ("ping", "-6", "-n")
+_PING_DF = ("-M", "do")
+_MAX_TIMEOUT_S = math.ceil(MAX_TIMEOUT_MS / 1000.0)
+_MAX_DEADLINE_S = math.ceil((MAX_COUNT - 1) * (MAX_INTERVAL_MS / 1000.0) + _MAX_TIMEOUT_S + 1.0)
+_ITOA = tuple(str(i) for i in range(max(MAX_COUNT, MAX_PACKET_SIZE, _MAX_TIMEOUT_S, _MAX_DEADLINE_S) + 1))
+
+_RTT_RE = re.compile(
+    r"(?:rtt|round-trip)\s+min/avg/max/(?:mdev|stddev)\s*=\s*"
+    r"([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+)\s*ms"
+)
 
 
 class HttpError(Exception):
@@ -47,28 +116,38 @@ class HttpError(Exception):
 
 
 def _bool_from_any(value: Any, *, field: str) -> bool:
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, int) and value in (0, 1):
-        return bool(value)
-    if isinstance(value, str):
-        lowered = value.strip().lower()
-        if lowered in ("true", "1", "yes", "y", "on"):
-            return True
-        if lowered in ("false", "0", "no", "n", "off"):
-            return False
-    raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be a boolean")
+    value_type = type(value)
+    if value_type is str:
+        value = value.strip().lower()
+    elif value_type is not bool and value_type is not int:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be a boolean")
+    result = _BOOL_MAP.get(value)
+    if result is None:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be a boolean")
+    return result
 
 def _looks_truthy(value: str | None) -> bool:
     if value is None:
         return False
-    lowered = value.strip().lower()
-    return lowered in ("1", "true", "yes", "y", "on")
+    return _BOOL_MAP.get(value.strip().lower(), False)
+
+
+def _parse_query(raw_query: str) -> dict[str, str]:
+    query: dict[str, str] = {}
+    for part in raw_query.split("&"):
+        key, _, value = part.partition("=")
+        if not value:
+            continue
+        if "%" in key or "+" in key:
+            key = urllib.parse.unquote_plus(key)
+        if key in _QUERY_KEYS and key not in query:
+            query[key] = urllib.parse.unquote_plus(value)
+    return query
 
 
-def _int_from_query(query: dict[str, list[str]], key: str, *, default: int) -> int:
-    raw = query.get(key, [None])[0]
-    if raw is None or raw == "":
+def _int_from_query(query: dict[str, str], key: str, *, default: int) -> int:
+    raw = query.get(key)
+    if raw is None:
         return default
     try:
         return int(raw)
@@ -81,65 +160,90 @@ def _require_in_range(value: int, *, field: str, min_value: int, max_value: int)
         raise HttpError(HTTPStatus.BAD_REQUEST, f"{field} must be in range {min_value}..{max_value}")
 
 
-def _format_metric_line(name: str, value: float | int) -> str:
-    if isinstance(value, float):
-        if value != value:  # NaN
-            return f"{name} NaN\n"
-        return f"{name} {value:.6f}\n"
-    return f"{name} {value}\n"
+def _format_float(value: float) -> bytes:
+    if value != value:  # NaN
+        return b"NaN"
+    return b"%.6f" % value
 
 
 def _looks_like_ipv6(target: str) -> bool:
     return ":" in target
 
 
-def _parse_ping_output(text: str, *, expected_count: int) -> dict[str, float]:
-    result: dict[str, float] = {"packets_sent": float(expected_count)}
+def _set_rtt_stats(
+    result: dict[str, float], *, n: int, sum_ms: float, sumsq_ms: float, min_ms: float, max_ms: float
+) -> tuple[float, float]:
+    avg_ms = sum_ms / n
+    std_ms = math.sqrt(max(0.0, sumsq_ms / n - avg_ms * avg_ms))
+    result["rtt_min_seconds"] = min_ms / 1000.0
+    result["rtt_avg_seconds"] = avg_ms / 1000.0
+    result["rtt_max_seconds"] = max_ms / 1000.0
+    result["rtt_stddev_seconds"] = std_ms / 1000.0
+    return avg_ms, std_ms
 
-    stats = _PACKET_STATS_RE.search(text)
-    if stats:
-        tx = float(stats.group("tx"))
-        rx = float(stats.group("rx"))
-        loss_percent = float(stats.group("loss"))
-        result["packets_sent"] = tx
-        result["packets_received"] = rx
-        result["packet_loss_ratio"] = max(0.0, min(1.0, loss_percent / 100.0))
 
-    rtt = _RTT_RE.search(text)
-    if rtt:
-        result["rtt_min_seconds"] = float(rtt.group("min")) / 1000.0
-        result["rtt_avg_seconds"] = float(rtt.group("avg")) / 1000.0
-        result["rtt_max_seconds"] = float(rtt.group("max")) / 1000.0
-        result["rtt_stddev_seconds"] = float(rtt.group("stddev")) / 1000.0
+def _parse_ping_output(text: str, *, expected_count: int) -> dict[str, float]:
+    result: dict[str, float] = {"packets_sent": float(expected_count)}
 
-    times_ms = []
-    for match in _REPLY_TIME_RE.finditer(text):
-        try:
-            times_ms.append(float(match.group("ms")))
-        except ValueError:
-            continue
+    replies = 0
+    n = 0
+    sum_ms = 0.0
+    sumsq_ms = 0.0
+    min_ms = math.inf
+    max_ms = -math.inf
+    stats = None
+    rtt = None
+
+    for line in text.splitlines():
+        if "bytes from" in line:
+            if "icmp_seq=" in line:
+                replies += 1
+            _, sep, tail = line.rpartition("time=")
+            if not sep:
+                _, sep, tail = line.rpartition("time<")
+                if not sep:
+                    continue
+            tail = tail.rstrip()
+            if not tail.endswith("ms"):
+                continue
+            try:
+                ms = float(tail[:-2])
+            except ValueError:
+                continue
+            n += 1
+            sum_ms += ms
+            sumsq_ms += ms * ms
+            if ms < min_ms:
+                min_ms = ms
+            if ms > max_ms:
+                max_ms = ms
+        elif stats is None and "packets transmitted" in line:
+            stats = _PACKET_STATS_RE.match(line)
+        elif rtt is None and line.startswith(("rtt ", "round-trip")):
+            rtt = _RTT_RE.match(line)
 
-    if "packets_received" not in result:
-        replies = len(times_ms)
-        if replies == 0:
-            replies = len(_REPLY_RE.findall(text))
-        result["packets_received"] = float(replies)
+    if stats:
+        tx_raw, rx_raw, loss_raw = stats.groups()
+        result["packets_sent"] = float(tx_raw)
+        result["packets_received"] = float(rx_raw)
+        result["packet_loss_ratio"] = max(0.0, min(1.0, float(loss_raw) / 100.0))
+    else:
+        rx = float(n or replies)
         tx = float(expected_count)
-        rx = float(replies)
+        result["packets_received"] = rx
         if tx > 0:
             result["packet_loss_ratio"] = max(0.0, min(1.0, 1.0 - (rx / tx)))
         else:
             result["packet_loss_ratio"] = 1.0
 
-    if "rtt_avg_seconds" not in result and times_ms:
-        n = len(times_ms)
-        avg_ms = sum(times_ms) / n
-        var_ms = sum((x - avg_ms) ** 2 for x in times_ms) / n
-        std_ms = math.sqrt(var_ms)
-        result["rtt_min_seconds"] = min(times_ms) / 1000.0
-        result["rtt_avg_seconds"] = avg_ms / 1000.0
-        result["rtt_max_seconds"] = max(times_ms) / 1000.0
-        result["rtt_stddev_seconds"] = std_ms / 1000.0
+    if rtt:
+        min_raw, avg_raw, max_raw, stddev_raw = rtt.groups()
+        result["rtt_min_seconds"] = float(min_raw) / 1000.0
+        result["rtt_avg_seconds"] = float(avg_raw) / 1000.0
+        result["rtt_max_seconds"] = float(max_raw) / 1000.0
+        result["rtt_stddev_seconds"] = float(stddev_raw) / 1000.0
+    elif n:
+        _set_rtt_stats(result, n=n, sum_ms=sum_ms, sumsq_ms=sumsq_ms, min_ms=min_ms, max_ms=max_ms)
 
     return result
 
@@ -157,20 +261,17 @@ def _run_ping(
     timeout_s = max(1, math.ceil(timeout_ms / 1000.0))
     deadline_s = max(1, math.ceil((count - 1) * interval_s + timeout_s + 1.0))
 
-    args = ["ping"]
-
-    if _looks_like_ipv6(target):
-        args.append("-6")
-    else:
-        args.append("-4")
-
-    args.extend(["-n", "-c", str(count), "-i", f"{interval_s:.3f}", "-W", str(timeout_s), "-w", str(deadline_s)])
-    args.extend(["-s", str(packet_size)])
-
-    if df and not _looks_like_ipv6(target):
-        args.extend(["-M", "do"])
-
-    args.append(target)
+    ipv6 = _looks_like_ipv6(target)
+    args = (
+        *(_PING6_BASE if ipv6 else _PING4_BASE),
+        "-c", _ITOA[count],
+        "-i", f"{interval_s:.3f}",
+        "-W", _ITOA[timeout_s],
+        "-w", _ITOA[deadline_s],
+        "-s", _ITOA[packet_size],
+        *(_PING_DF if df and not ipv6 else ()),
+        target,
+    )
 
     start = time.monotonic()
     proc = subprocess.run(args, capture_output=True, text=True)  # noqa: S603
@@ -179,25 +280,162 @@ def _run_ping(
     return proc.returncode, output, duration
 
 
+def _icmp_checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _icmp_probe_native(
+    *,
+    target: str,
+    count: int,
+    interval_ms: int,
+    timeout_ms: int,
+    packet_size: int,
+    df: bool,
+) -> tuple[int, str, float, dict[str, float]] | None:
+    ipv6 = _looks_like_ipv6(target)
+    family = socket.AF_INET6 if ipv6 else socket.AF_INET
+    try:
+        sock = socket.socket(family, socket.SOCK_DGRAM, socket.IPPROTO_ICMPV6 if ipv6 else socket.IPPROTO_ICMP)
+    except OSError:
+        return None
+
+    start = time.monotonic()
+    result: dict[str, float] = {"packets_sent": float(count), "packets_received": 0.0, "packet_loss_ratio": 1.0}
+    with sock:
+        try:
+            addr = socket.getaddrinfo(target, None, family, socket.SOCK_DGRAM)[0][4]
+        except OSError as exc:
+            return 2, f"ping: {target}: {exc.strerror or exc}\n", time.monotonic() - start, result
+
+        if df and not ipv6:
+            sock.setsockopt(socket.IPPROTO_IP, _IP_MTU_DISCOVER, _IP_PMTUDISC_DO)
+        sock.setblocking(False)
+
+        request_type, reply_type = (_ICMP6_ECHO_REQUEST, _ICMP6_ECHO_REPLY) if ipv6 else (_ICMP_ECHO_REQUEST, _ICMP_ECHO_REPLY)
+        ident = os.getpid() & 0xFFFF
+        payload = _ICMP_PAYLOAD[:packet_size]
+        interval_s = max(0.001, interval_ms / 1000.0)
+        timeout_s = timeout_ms / 1000.0
+        deadline = start + max(1, math.ceil((count - 1) * interval_s + math.ceil(timeout_s) + 1.0))
+
+        out = [f"PING {target} ({addr[0]}) {packet_size} data bytes\n"]
+        sent_at: dict[int, float] = {}
+        rx = 0
+        sum_ms = 0.0
+        sumsq_ms = 0.0
+        min_ms = math.inf
+        max_ms = -math.inf
+        seq = 0
+        next_send = start
+        end = deadline
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(sock, selectors.EVENT_READ)
+            while True:
+                now = time.monotonic()
+                if seq < count and now >= next_send:
+                    seq += 1
+                    packet = struct.pack("!BBHHH", request_type, 0, 0, ident, seq) + payload
+                    if not ipv6:
+                        packet = struct.pack("!BBHHH", request_type, 0, _icmp_checksum(packet), ident, seq) + payload
+                    try:
+                        sock.sendto(packet, addr)
+                        sent_at[seq] = now
+                    except OSError as exc:
+                        out.append(f"ping: sendmsg: icmp_seq={seq}: {exc.strerror}\n")
+                    next_send += interval_s
+                    if seq == count:
+                        end = min(deadline, now + timeout_s)
+                    continue
+                if now >= end or (seq == count and not sent_at):
+                    break
+
+                wait_until = end if seq == count else min(next_send, end)
+                if not selector.select(max(0.0, wait_until - now)):
+                    continue
+                while True:
+                    try:
+                        data = sock.recv(65535)
+                    except OSError:
+                        break
+                    received = time.monotonic()
+                    if len(data) < 8:
+                        continue
+                    icmp_type, _, _, _, reply_seq = struct.unpack_from("!BBHHH", data)
+                    sent = sent_at.pop(reply_seq, None) if icmp_type == reply_type else None
+                    if sent is None:
+                        continue
+                    rtt_ms = (received - sent) * 1000.0
+                    rx += 1
+                    sum_ms += rtt_ms
+                    sumsq_ms += rtt_ms * rtt_ms
+                    if rtt_ms < min_ms:
+                        min_ms = rtt_ms
+                    if rtt_ms > max_ms:
+                        max_ms = rtt_ms
+                    out.append(f"{len(data)} bytes from {addr[0]}: icmp_seq={reply_seq} time={rtt_ms:.3f} ms\n")
+
+    loss = 1.0 - rx / count
+    result["packets_received"] = float(rx)
+    result["packet_loss_ratio"] = loss
+    out.append(f"\n--- {target} ping statistics ---\n")
+    out.append(f"{count} packets transmitted, {rx} received, {loss * 100.0:g}% packet loss\n")
+    if rx:
+        avg_ms, std_ms = _set_rtt_stats(
+            result, n=rx, sum_ms=sum_ms, sumsq_ms=sumsq_ms, min_ms=min_ms, max_ms=max_ms
+        )
+        out.append(f"rtt min/avg/max/mdev = {min_ms:.3f}/{avg_ms:.3f}/{max_ms:.3f}/{std_ms:.3f} ms\n")
+    return (0 if rx else 1), "".join(out), time.monotonic() - start, result
+
+
 class Handler(BaseHTTPRequestHandler):
     server_version = "home-noc-icmp-prober/1.0"
+    timeout = 30
+    _slot_held = False
 
     def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
         print("[%s] %s" % (self.log_date_time_string(), format % args))
 
+    def handle_one_request(self) -> None:
+        try:
+            super().handle_one_request()
+        finally:
+            if self._slot_held:
+                self._slot_held = False
+                _REQUEST_SLOTS.release()
+
+    def parse_request(self) -> bool:
+        _REQUEST_SLOTS.acquire()
+        self._slot_held = True
+        return super().parse_request()
+
     def _send_text(self, status: int, text: str) -> None:
-        data = text.encode("utf-8")
-        self.send_response(status)
-        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
-        self.send_header("Content-Length", str(len(data)))
-        self.end_headers()
-        self.wfile.write(data)
+        self._send_bytes(status, text.encode("utf-8"))
+
+    def _send_bytes(self, status: int, data: bytes) -> None:
+        self.log_request(status)
+        head = (
+            f"{self.protocol_version} {int(status)} {self.responses[status][0]}\r\n"
+            f"Server: {self.version_string()}\r\n"
+            f"Date: {self.date_time_string()}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n"
+        )
+        self.wfile.write(head.encode("latin-1") + data)
 
     def do_GET(self) -> None:  # noqa: N802
         try:
-            parsed = urllib.parse.urlparse(self.path)
-            path = parsed.path
+            if self.path == "/healthz":
+                self._send_text(HTTPStatus.OK, "ok\n")
+                return
 
+            path, _, raw_query = self.path.partition("?")
             if path == "/healthz":
                 self._send_text(HTTPStatus.OK, "ok\n")
                 return
@@ -205,104 +443,83 @@ class Handler(BaseHTTPRequestHandler):
             if path != "/probe":
                 raise HttpError(HTTPStatus.NOT_FOUND, "not found")
 
-            query = urllib.parse.parse_qs(parsed.query or "")
-            debug = _looks_truthy(query.get("debug", [None])[0])
-            target = (query.get("target", [None])[0] or "").strip()
+            query = _parse_query(raw_query) if raw_query else {}
+            debug = _looks_truthy(query.get("debug"))
+            target = query.get("target", "").strip()
             if not target:
                 raise HttpError(HTTPStatus.BAD_REQUEST, "target is required")
-            if any(ch.isspace() for ch in target):
-                raise HttpError(HTTPStatus.BAD_REQUEST, "target must not contain whitespace")
-            if target.startswith("[") and target.endswith("]"):
-                target = target[1:-1]
+            match = _TARGET_RE.match(target)
+            if match is None:
+                if any(ch.isspace() for ch in target):
+                    raise HttpError(HTTPStatus.BAD_REQUEST, "target must not contain whitespace")
+                raise HttpError(HTTPStatus.BAD_REQUEST, "target must be a hostname or IP address")
+            target = match.group(1) or match.group(2)
 
             count = _int_from_query(query, "count", default=DEFAULT_COUNT)
             interval_ms = _int_from_query(query, "interval_ms", default=DEFAULT_INTERVAL_MS)
             timeout_ms = _int_from_query(query, "timeout_ms", default=DEFAULT_TIMEOUT_MS)
             packet_size = _int_from_query(query, "packet_size", default=DEFAULT_PACKET_SIZE)
-            df = _bool_from_any((query.get("df", [None])[0] if "df" in query else DEFAULT_DF), field="df")
+            df = _bool_from_any(query.get("df", DEFAULT_DF), field="df")
 
             _require_in_range(count, field="count", min_value=1, max_value=MAX_COUNT)
             _require_in_range(interval_ms, field="interval_ms", min_value=MIN_INTERVAL_MS, max_value=MAX_INTERVAL_MS)
             _require_in_range(timeout_ms, field="timeout_ms", min_value=MIN_TIMEOUT_MS, max_value=MAX_TIMEOUT_MS)
             _require_in_range(packet_size, field="packet_size", min_value=MIN_PACKET_SIZE, max_value=MAX_PACKET_SIZE)
 
-            code, output, duration = _run_ping(
-                target=target,
-                count=count,
-                interval_ms=interval_ms,
-                timeout_ms=timeout_ms,
-                packet_size=packet_size,
-                df=df,
-            )
-
-            parsed_stats = _parse_ping_output(output, expected_count=count)
+            probe_args: dict[str, Any] = {
+                "target": target,
+                "count": count,
+                "interval_ms": interval_ms,
+                "timeout_ms": timeout_ms,
+                "packet_size": packet_size,
+                "df": df,
+            }
+            native = _icmp_probe_native(**probe_args)
+            if native is not None:
+                code, output, duration, parsed_stats = native
+            else:
+                code, output, duration = _run_ping(**probe_args)
+                parsed_stats = _parse_ping_output(output, expected_count=count)
             tx = int(parsed_stats.get("packets_sent", float(count)))
             rx = int(parsed_stats.get("packets_received", 0.0))
             loss = parsed_stats.get("packet_loss_ratio", 1.0 if rx == 0 else 0.0)
 
             success = 1 if rx > 0 else 0
 
-            lines = []
+            data = _METRICS_TEMPLATE % (
+                success,
+                tx,
+                rx,
+                loss,
+                _format_float(parsed_stats.get("rtt_min_seconds", math.nan)),
+                _format_float(parsed_stats.get("rtt_avg_seconds", math.nan)),
+                _format_float(parsed_stats.get("rtt_max_seconds", math.nan)),
+                _format_float(parsed_stats.get("rtt_stddev_seconds", math.nan)),
+                duration,
+            )
             if debug:
-                lines.append(f"# debug ping_exit_code={code}\n")
-                lines.append("# debug ping_output_begin\n")
+                lines = [f"# debug ping_exit_code={code}\n", "# debug ping_output_begin\n"]
                 for line in output.splitlines()[:80]:
                     lines.append(f"# {line}\n")
                 lines.append("# debug ping_output_end\n")
+                data = "".join(lines).encode("utf-8") + data
 
-            lines.append("# HELP home_noc_icmp_probe_success 1 if at least one reply was received.\n")
-            lines.append("# TYPE home_noc_icmp_probe_success gauge\n")
-            lines.append(_format_metric_line("home_noc_icmp_probe_success", success))
-
-            lines.append("# HELP home_noc_icmp_packets_sent Number of ICMP echo requests sent in the last probe.\n")
-            lines.append("# TYPE home_noc_icmp_packets_sent gauge\n")
-            lines.append(_format_metric_line("home_noc_icmp_packets_sent", tx))
-
-            lines.append("# HELP home_noc_icmp_packets_received Number of ICMP echo replies received in the last probe.\n")
-            lines.append("# TYPE home_noc_icmp_packets_received gauge\n")
-            lines.append(_format_metric_line("home_noc_icmp_packets_received", rx))
-
-            lines.append("# HELP home_noc_icmp_packet_loss_ratio Packet loss ratio (0..1) for the last probe burst.\n")
-            lines.append("# TYPE home_noc_icmp_packet_loss_ratio gauge\n")
-            lines.append(_format_metric_line("home_noc_icmp_packet_loss_ratio", float(loss)))
-
-            rtt_min = parsed_stats.get("rtt_min_seconds", float("nan"))
-            rtt_avg = parsed_stats.get("rtt_avg_seconds", float("nan"))
-            rtt_max = parsed_stats.get("rtt_max_seconds", float("nan"))
-            rtt_stddev = parsed_stats.get("rtt_stddev_seconds", float("nan"))
-
-            lines.append("# HELP home_noc_icmp_rtt_min_seconds Minimum round-trip time (seconds) in the last probe burst.\n")
-            lines.append("# TYPE home_noc_icmp_rtt_min_seconds gauge\n")
-            lines.append(_format_metric_line("home_noc_icmp_rtt_min_seconds", float(rtt_min)))
-
-            lines.append("# HELP home_noc_icmp_rtt_avg_seconds Average round-trip time (seconds) in the last probe burst.\n")
-            lines.append("# TYPE home_noc_icmp_rtt_avg_seconds gauge\n")
-            lines.append(_format_metric_line("home_noc_icmp_rtt_avg_seconds", float(rtt_avg)))
-
-            lines.append("# HELP home_noc_icmp_rtt_max_seconds Maximum round-trip time (seconds) in the last probe burst.\n")
-            lines.append("# TYPE home_noc_icmp_rtt_max_seconds gauge\n")
-            lines.append(_format_metric_line("home_noc_icmp_rtt_max_seconds", float(rtt_max)))
-
-            lines.append("# HELP home_noc_icmp_rtt_stddev_seconds Round-trip time stddev (seconds) in the last probe burst.\n")
-            lines.append("# TYPE home_noc_icmp_rtt_stddev_seconds gauge\n")
-            lines.append(_format_metric_line("home_noc_icmp_rtt_stddev_seconds", float(rtt_stddev)))
-
-            lines.append("# HELP home_noc_icmp_probe_duration_seconds Total time spent running the last probe.\n")
-            lines.append("# TYPE home_noc_icmp_probe_duration_seconds gauge\n")
-            lines.append(_format_metric_line("home_noc_icmp_probe_duration_seconds", float(duration)))
-
-            self._send_text(HTTPStatus.OK, "".join(lines))
+            self._send_bytes(HTTPStatus.OK, data)
         except HttpError as exc:
             self._send_text(int(exc.status), f"error: {exc.message}\n")
         except Exception as exc:  # noqa: BLE001
             self._send_text(HTTPStatus.INTERNAL_SERVER_ERROR, f"error: {exc}\n")
 
 
+class Server(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
 def main() -> None:
     bind = os.environ.get("BIND", "0.0.0.0")
     port = int(os.environ.get("PORT", "9985"))
-    print(f"[server] listening on http://{bind}:{port}")
-    server = ThreadingHTTPServer((bind, port), Handler)
+    print(f"[server] listening on http://{bind}:{port} (workers={WORKERS})")
+    server = Server((bind, port), Handler)
     server.serve_forever()
 
 